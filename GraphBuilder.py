@@ -1,8 +1,53 @@
 import networkx as nx
+import pyvis
 from pyvis.network import Network
+from jinja2 import Environment, FileSystemLoader
 import json
+import os
+import shutil
+import sys
+from types import MappingProxyType
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+def _json_default(value):
+    """Convert numpy/pandas scalars (or anything else) into JSON-friendly values"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def _to_json(data):
+    """Serialize data for the JavaScript payload, preferring orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=_json_default, separators=(',', ':'))
+
+def _slim_edge_data(data):
+    """Reduce edge attributes to the fields graph-handlers.js reads"""
+    # Hierarchy edges carry only their type and are serialized read-only, so share them
+    if len(data) == 1 and 'edge_type' in data:
+        return data
+    method = data.get('method')
+    if method:
+        return {'edge_type': data.get('edge_type', 'default'), 'method': method}
+    return {'edge_type': data.get('edge_type', 'default')}
+
+# pyvis builds a fresh Jinja environment per Network, recompiling its page template for
+# every graph; share one environment so the template is compiled once per process
+_PYVIS_TEMPLATE_DIR = os.path.join(os.path.dirname(pyvis.__file__), 'templates')
+_PYVIS_TEMPLATE_ENV = Environment(loader=FileSystemLoader(_PYVIS_TEMPLATE_DIR))
+
+def _copy_local_resources():
+    """Copy the JS/CSS assets referenced by pyvis's 'local' pages into the working directory"""
+    for resource in ('bindings', 'tom-select', 'vis-9.1.2'):
+        target = os.path.join('lib', resource)
+        if not os.path.exists(target):
+            shutil.copytree(os.path.join(_PYVIS_TEMPLATE_DIR, 'lib', resource), target)
+
 class NodeFormatter:
     """Simple formatter that uses DataFrame column values directly"""
     
@@ -10,6 +55,9 @@ class NodeFormatter:
     def get_display_name(data, field_name):
         """Get display name from DataFrame data, return empty string if missing"""
         value = data.get(field_name, '')
+        # Display fields are almost always strings already; skip the pd.notna dispatch for them
+        if type(value) is str:
+            return value
         return str(value) if value and pd.notna(value) else ''
     
     @staticmethod
@@ -126,14 +174,129 @@ EDGE_STYLES = {
     'default': {'width': 2, 'color': '#666666'}
 }
 
+# 📐 EXPAND LAYOUT - child spacing used by the browser when a node is expanded
+CHILD_LAYOUTS = {
+    'dataset': {'xSpacing': 400, 'yOffset': 220},
+    'datapoint': {'xSpacing': 180, 'yOffset': 180},
+    'table': {'xSpacing': 200, 'yOffset': 180},
+    'column': {'xSpacing': 150, 'yOffset': 160},
+    'downstream_table': {'xSpacing': 220, 'yOffset': 200},
+    'downstream_column': {'xSpacing': 140, 'yOffset': 160},
+    'default': {'xSpacing': 250, 'yOffset': 180}
+}
+
+# Node types rendered on the initial graph; everything else starts collapsed
+_VISIBLE_TYPES = frozenset({'model', 'function'})
+
+# Fallback style for node types without an entry in GRAPH_STYLES
+_DEFAULT_NODE_STYLE = MappingProxyType({
+    'color': {'background': '#F0F8FF', 'border': '#D0E8EF'}, 
+    'size': 15, 
+    'shape': 'ellipse'
+})
+
+# Base node styles and edge properties per type, shared by every node/edge of that type.
+# Read-only views, so an accidental in-place edit fails instead of restyling other nodes.
+_NODE_BASE_STYLES = {node_type: MappingProxyType(style) for node_type, style in GRAPH_STYLES.items()}
+_EDGE_BASE_PROPS = {
+    edge_type: MappingProxyType({'width': config.get('width', 2), 'color': config.get('color', '#666666')})
+    for edge_type, config in EDGE_STYLES.items()
+}
+
+# Node styles are constant at runtime, so serialize them for the JavaScript side once
+_GRAPH_STYLES_JSON = _to_json(GRAPH_STYLES)
+_CHILD_LAYOUTS_JSON = _to_json(CHILD_LAYOUTS)
+
+def _handlers_script(hidden_nodes_json, edge_data_json, auto_expand_plan_json):
+    """Script tags loading graph-handlers.js and initializing it with pre-serialized data"""
+    return f"""
+        <script src="static/graph-handlers.js"></script>
+        <script type="text/javascript">
+            // Initialize graph handlers with data
+            initializeGraphHandlers(
+                {hidden_nodes_json},
+                {_GRAPH_STYLES_JSON},
+                {edge_data_json},
+                {_CHILD_LAYOUTS_JSON},
+                {auto_expand_plan_json}
+            );
+        </script>
+        """
+
+_EMPTY_HANDLERS_JS = _handlers_script('{}', '{}', '{}')
+
+# vis.js options for the saved page
+_PYVIS_OPTIONS = {
+    'layout': {
+        'hierarchical': {
+            'enabled': True,
+            'direction': 'UD',
+            'sortMethod': 'directed',
+            'shakeTowards': 'roots',
+            'nodeSpacing': 200,
+            'levelSeparation': 250
+        }
+    },
+    'physics': {
+        'enabled': False
+    },
+    'interaction': {
+        'dragNodes': True,
+        'dragView': True,
+        'zoomView': True
+    },
+    'nodes': {
+        'font': {
+            'multi': True,
+            'align': 'center'
+        }
+    },
+    'edges': {
+        'font': {
+            'size': 10,
+            'color': '#333333',
+            'strokeWidth': 1,
+            'strokeColor': '#ffffff'
+        },
+        'labelHighlightBold': False
+    }
+}
+
 class ExpandableNetworkGraph:
-    def __init__(self, width="100%", height="600px"):
-        self.G = nx.DiGraph()
-        self.hidden_nodes = {}
+    def __init__(self, width="100%", height="600px", keep_hidden_nodes=True):
+        # Node and edge tables: node_id -> attributes and source -> {target: attributes}.
+        # No graph algorithms run on them, so plain dicts stand in for a networkx graph (see G)
+        self._nodes = {}
+        self._edges = {}
+        # When False, collapsed (non-visible) nodes are kept only in the browser payload
+        # and their edges in a flat source -> {target: data} table instead of the tables above
+        self.keep_hidden_nodes = keep_hidden_nodes
+        self._hidden_edges = {}
+        # Nodes/edges shown on the initial graph, maintained as they are added so
+        # build_initial_graph does not have to scan the whole graph
+        self._visible_nodes = set()
+        self._visible_edges = {}
+        # Tooltips of visible nodes, resolved once when the node is added and kept out of
+        # the node data so they never override a caller's 'title' attribute
+        self._tooltips = {}
+        # Hidden children per parent: {parent_id: {child_id: child_info}}, exposed as hidden_nodes
+        self._hidden_nodes = {}
+        self._edge_type_map = {}
+        self._edge_type_config = None
+        self._display_field_map = {}
+        self._display_field_config = None
+        # Last handler script generated and last networkx view built (see G); both are
+        # cleared whenever nodes, edges or children change
+        self._handlers_js = None
+        self._graph = None
         self.net = Network(width=width, height=height, bgcolor="#ffffff", font_color="black", directed=True)
+        self.net.templateEnv = _PYVIS_TEMPLATE_ENV
 
     def add_node(self, node_id, data_dict, node_type='regular', children=None, hierarchy_config=None, **properties):
         """Add node with streamlined display system"""
+        self._handlers_js = self._graph = None
+        node_type = sys.intern(node_type)
+        
         # Get display label using new formatter
         display_label = self._format_node_label(node_type, data_dict, hierarchy_config)
         
@@ -145,70 +308,175 @@ class ExpandableNetworkGraph:
             **data_dict,
             **properties
         }
-        self.G.add_node(node_id, **node_data)
+        existed = False
+        if self.keep_hidden_nodes or node_type in _VISIBLE_TYPES:
+            existed = self._store_node(node_id, node_data)
+            # Edges parked while this node was missing now have both endpoints stored
+            if not self.keep_hidden_nodes and self._promote_hidden_edges(node_id):
+                existed = True
+        if node_type in _VISIBLE_TYPES:
+            self._visible_nodes.add(node_id)
+            self._tooltips[node_id] = NodeFormatter.get_tooltip(self._nodes[node_id], node_type)
+            # Promote edges that were added before this node
+            if existed:
+                for source, targets in self._edges.items():
+                    if node_id in targets and source in self._visible_nodes:
+                        self._visible_edges[source, node_id] = None
+                for target in self._edges.get(node_id, ()):
+                    if target in self._visible_nodes:
+                        self._visible_edges[node_id, target] = None
         
         if children:
-            self.hidden_nodes[node_id] = children if isinstance(children, dict) else {f"{node_id}_child_{i}": child for i, child in enumerate(children)}
+            if not isinstance(children, dict):
+                children = {f"{node_id}_child_{i}": child for i, child in enumerate(children)}
+            self._set_children(node_id, children)
+    
+    def _store_node(self, node_id, node_data):
+        """Insert a node, merging attributes into an existing entry; returns whether it existed"""
+        existing = self._nodes.get(node_id)
+        if existing is None:
+            self._nodes[node_id] = node_data
+            return False
+        existing.update(node_data)
+        return True
+    
+    def _promote_hidden_edges(self, node_id):
+        """Move parked edges of node_id whose other endpoint is stored into the edge table; returns whether any moved"""
+        moved = False
+        for source, targets in list(self._hidden_edges.items()):
+            if source == node_id:
+                ready = [target for target in targets if target in self._nodes]
+            elif node_id in targets and source in self._nodes:
+                ready = [node_id]
+            else:
+                continue
+            for target in ready:
+                self._store_edge(source, target, targets.pop(target))
+                moved = True
+            if not targets:
+                del self._hidden_edges[source]
+        return moved
+    
+    def _store_edge(self, source, target, edge_data):
+        """Insert an edge, merging attributes into an existing entry; endpoints are added as needed"""
+        self._nodes.setdefault(source, {})
+        self._nodes.setdefault(target, {})
+        targets = self._edges.setdefault(source, {})
+        existing = targets.get(target)
+        if existing is None:
+            targets[target] = edge_data
+        else:
+            existing.update(edge_data)
+    
+    @property
+    def G(self):
+        """Read-only networkx snapshot of the node/edge tables, rebuilt only after the graph changes.
+        
+        The snapshot is frozen, so structural changes raise instead of being silently lost.
+        Its attribute dicts are copies: editing them (e.g. G.nodes[n]['color'] = ...) does not
+        change the rendered graph. Use add_node/add_edge, which merge into existing entries.
+        """
+        if self._graph is None:
+            graph = nx.DiGraph()
+            graph.add_nodes_from(self._nodes.items())
+            graph.add_edges_from((source, target, data) for source, targets in self._edges.items()
+                                 for target, data in targets.items())
+            self._graph = nx.freeze(graph)
+        return self._graph
+    
+    def _set_children(self, parent_id, children):
+        """Store a node's hidden children, normalized once so the table serializes as-is"""
+        self._hidden_nodes[parent_id] = {
+            child_id: child_info if isinstance(child_info, dict) else {'label': str(child_info), 'node_type': 'table'}
+            for child_id, child_info in children.items()
+        }
+    
+    @property
+    def hidden_nodes(self):
+        """Hidden children per parent, shaped as {parent_id: {child_id: child_info}}.
+        
+        The cached handler script is refreshed by add_node and by assigning a new table;
+        in-place edits made after a save are not picked up.
+        """
+        return self._hidden_nodes
+    
+    @hidden_nodes.setter
+    def hidden_nodes(self, hidden_nodes):
+        self._handlers_js = None
+        self._hidden_nodes = hidden_nodes
     
     def _format_node_label(self, node_type, node_data, hierarchy_config=None):
         """Get node label directly from DataFrame data"""
         if hierarchy_config is None:
             hierarchy_config = DEFAULT_HIERARCHY_CONFIG
             
-        # Find the level config for this node type
-        level_config = next((level for level in hierarchy_config['levels'] if level['name'] == node_type), None)
+        # Index the display field of each level by node type once per hierarchy config
+        if self._display_field_config is not hierarchy_config:
+            self._display_field_map = {}
+            for level in hierarchy_config['levels']:
+                self._display_field_map.setdefault(level['name'], level.get('display_field', level.get('id_field', '')))
+            self._display_field_config = hierarchy_config
         
-        if not level_config:
+        display_field = self._display_field_map.get(node_type)
+        if display_field is None:
             return ''
         
         # Get display name from the specified field
-        display_field = level_config.get('display_field', level_config.get('id_field', ''))
         return NodeFormatter.get_display_name(node_data, display_field)
     
     def add_edge(self, source, target, edge_type='default', **properties):
         """Add edge with configured styling"""
+        self._handlers_js = self._graph = None
+        edge_type = sys.intern(edge_type)
         edge_data = {'edge_type': edge_type, **properties}
-        self.G.add_edge(source, target, **edge_data)
+        if self.keep_hidden_nodes or (source in self._nodes and target in self._nodes):
+            self._store_edge(source, target, edge_data)
+        else:
+            self._hidden_edges.setdefault(source, {})[target] = edge_data
+        if source in self._visible_nodes and target in self._visible_nodes:
+            self._visible_edges[source, target] = None
     
     def _get_edge_props(self, edge_type, edge_data):
         """Get edge properties from streamlined config"""
         edge_config = EDGE_STYLES.get(edge_type, EDGE_STYLES['default'])
         
-        # Base style
-        props = {'width': edge_config.get('width', 2), 'color': edge_config.get('color', '#666666')}
+        # Base style is shared; pyvis copies it when the edge is added
+        props = _EDGE_BASE_PROPS.get(edge_type, _EDGE_BASE_PROPS['default'])
         
         # Add label if configured
         label_field = edge_config.get('label_field')
         if label_field and label_field in edge_data:
             label = edge_data[label_field]
             if label:
-                props['label'] = label
-                props['font'] = {'size': 10, 'color': '#333333'}
+                return {**props, 'label': label, 'font': {'size': 10, 'color': '#333333'}}
         
         return props
     
     def _get_node_style(self, node_id, hierarchy_config=None):
         """Get complete node styling using simplified system"""
-        node_data = self.G.nodes[node_id]
+        node_data = self._nodes[node_id]
         node_type = node_data.get('node_type', 'regular')
         
-        # Get base style from config
-        style = GRAPH_STYLES.get(node_type, {
-            'color': {'background': '#F0F8FF', 'border': '#D0E8EF'}, 
-            'size': 15, 'shape': 'ellipse'
-        }).copy()
+        # Get base style from config - shared, pyvis copies it when the node is added
+        style = _NODE_BASE_STYLES.get(node_type, _DEFAULT_NODE_STYLE)
+        
+        # Tooltip was resolved when the node was added
+        tooltip = self._tooltips.get(node_id)
+        expandable = node_data.get('expandable', False)
+        if not tooltip and not expandable:
+            return style
         
-        # Get tooltip using node type for customization
-        tooltip = NodeFormatter.get_tooltip(node_data, node_type)
+        overrides = {}
         if tooltip:
-            style['title'] = tooltip
+            overrides['title'] = tooltip
         
         # Visual indicator for expandable nodes
-        if node_data.get('expandable', False):
-            style['borderWidth'] = style.get('borderWidth', 1) + 2
-            style['borderWidthSelected'] = style.get('borderWidth', 3) + 1
+        if expandable:
+            border_width = style.get('borderWidth', 1) + 2
+            overrides['borderWidth'] = border_width
+            overrides['borderWidthSelected'] = border_width + 1
         
-        return style
+        return {**style, **overrides}
     
     def _get_value(self, source, field, default=None):
         """Simple value extractor with null safety"""
@@ -225,230 +493,291 @@ class ExpandableNetworkGraph:
     def build_hierarchy_structure(self, df_sources, hierarchy_config):
         """Generic hierarchy builder that creates separate instances for cleaner hierarchy"""
         structure = {}
-        
+        columns = df_sources.columns
+
+        # Resolve the levels that can be built from this DataFrame once, up front.
+        # Model is handled separately; a level without a backing column ends the path.
+        levels = []
+        for level_config in hierarchy_config['levels']:
+            field_name = level_config['id_field']
+            if field_name == 'model_name':
+                continue
+            if field_name not in columns:
+                break
+            display_field = level_config.get('display_field', field_name)
+            levels.append((
+                level_config,
+                columns.get_loc(field_name),
+                columns.get_loc(display_field) if display_field in columns else None,
+                # Create function-specific dataset IDs so each function gets its own dataset instance
+                level_config['name'] == 'dataset' and len(levels) > 0
+            ))
+
+        if not levels:
+            return structure
+
+        # Pull values and the null mask out of pandas once instead of per row/cell
+        values = df_sources.to_numpy(dtype=object)
+        notna_mask = pd.notna(values)
+        column_names = columns.to_numpy(dtype=object)
+
+        # The walk below is pure interpreter work over object cells; plain lists index far
+        # faster than numpy object/bool scalars, so hand the loop native Python rows
+        column_names = column_names.tolist()
+
         # Build nested structure by grouping according to hierarchy levels
-        for _, row in df_sources.iterrows():
+        for row, row_mask in zip(values.tolist(), notna_mask.tolist()):
             current_level = structure
-            path = []
-            
+            row_data = None
+            root_id = None
+
             # Navigate through each level of the hierarchy
-            for level_config in hierarchy_config['levels']:
-                field_name = level_config['id_field']
-                node_type = level_config['name']
-                
-                # Get the value for this level
-                if field_name == 'model_name':
-                    # Model is handled separately, skip in structure building
-                    continue
-                elif field_name in row.index and pd.notna(row[field_name]):
-                    node_id = row[field_name]
-                    
-                    # Create function-specific dataset IDs to avoid sharing
-                    # This ensures each function gets its own dataset instance
-                    if node_type == 'dataset' and len(path) > 0:
-                        # Prefix dataset with function name for uniqueness
-                        function_name = path[0]  # First item in path is function name
-                        node_id = f"{function_name}_{node_id}"
-                else:
+            for level_config, id_pos, display_pos, prefix_with_root in levels:
+                if not row_mask[id_pos]:
                     break  # Stop if we don't have data for this level
-                
-                path.append(node_id)
-                
+
+                node_id = row[id_pos]
+                if root_id is None:
+                    root_id = node_id  # First item in path is function name
+                elif prefix_with_root:
+                    # Interned so every row resolves to one shared key object
+                    node_id = sys.intern(f"{root_id}_{node_id}")
+
                 # Create node if it doesn't exist
-                if node_id not in current_level:
-                    current_level[node_id] = {
-                        'node_type': node_type,
+                node = current_level.get(node_id)
+                if node is None:
+                    node = current_level[node_id] = {
+                        'node_type': level_config['name'],
                         'data': {},
                         'children': {},
                         'level_config': level_config
                     }
-                
+
                 # Update node data with row information
-                display_field = level_config.get('display_field', field_name)
-                if display_field in row.index:
-                    # Use hierarchy config to determine display name - no hardcoded overrides
-                    display_name = row[display_field] if pd.notna(row[display_field]) else node_id
-                    
-                    current_level[node_id]['data'].update({
-                        'name': node_id,
-                        'display_name': display_name,
-                        **{k: v for k, v in row.items() if pd.notna(v)}
-                    })
-                
+                if display_pos is not None:
+                    if row_data is None:
+                        row_data = {name: value for name, value, present
+                                    in zip(column_names, row, row_mask) if present}
+
+                    # Use hierarchy config to determine display name - no hardcoded overrides.
+                    # Written in place (row values last, so they still win) rather than via a
+                    # merged temporary dict per level
+                    data = node['data']
+                    data['name'] = node_id
+                    data['display_name'] = row[display_pos] if row_mask[display_pos] else node_id
+                    data.update(row_data)
+
                 # Move to next level
-                current_level = current_level[node_id]['children']
-        
+                current_level = node['children']
+
         return structure
     
-    def _build_node_children(self, children_info, hierarchy_config=None):
-        """Build children structure using DataFrame data directly"""
-        children_dict = {}
-        
-        for child_id, child_info in children_info.items():
-            child_type = child_info.get('node_type', 'unknown')
-            child_data = child_info.get('data', {})
-            child_children = child_info.get('children', {})
-            
-            # Get label directly from data
-            label = self._format_node_label(child_type, child_data, hierarchy_config)
-            
-            children_dict[child_id] = {
-                'label': label,
-                'node_type': child_type,
-                'expandable': bool(child_children),
-                'auto_expand': child_info.get('auto_expand', child_type == 'table')
-            }
-            
-            # Recursively handle nested children
-            if child_children:
-                self.hidden_nodes[child_id] = self._build_node_children(child_children, hierarchy_config)
-        
-        return children_dict
-
     def create_hierarchy_nodes(self, structure, hierarchy_config, parent_id=None, parent_type=None):
-        """Recursively create nodes from hierarchy structure"""
-        for node_id, node_info in structure.items():
-            node_type = node_info['node_type']
-            node_data = node_info['data']
-            children = node_info['children']
-            
-            # Build children using streamlined method
-            children_dict = self._build_node_children(children, hierarchy_config) if children else {}
-            
-            # Create the node directly
-            self.add_node(node_id, node_data, node_type, children_dict, hierarchy_config)
+        """Create nodes from hierarchy structure in one iterative pass"""
+        self._handlers_js = self._graph = None
+        stack = [(parent_id, parent_type, structure, None)]
+        
+        while stack:
+            parent_id, parent_type, level_nodes, labels = stack.pop()
+            subtrees = []
             
-            # Create edge to parent if exists
-            if parent_id and parent_type:
-                edge_type = self._get_edge_type(parent_type, node_type, hierarchy_config)
-                if edge_type:
-                    self.add_edge(parent_id, node_id, edge_type)
+            for node_id, node_info in level_nodes.items():
+                node_type = node_info.get('node_type', 'unknown')
+                node_data = node_info.get('data', {})
+                children = node_info.get('children', {})
+                
+                # Labels of nested nodes were already resolved while building their parent's children
+                if labels is None:
+                    label = self._format_node_label(node_type, node_data, hierarchy_config)
+                else:
+                    label = labels[node_id]
+                
+                # Build one level of child metadata for the browser; deeper levels are
+                # filled in when the children themselves are visited
+                child_labels = {}
+                children_dict = {}
+                for child_id, child_info in children.items():
+                    child_type = child_info.get('node_type', 'unknown')
+                    child_labels[child_id] = self._format_node_label(child_type, child_info.get('data', {}), hierarchy_config)
+                    children_dict[child_id] = {
+                        'label': child_labels[child_id],
+                        'node_type': child_type,
+                        'expandable': bool(child_info.get('children')),
+                        'auto_expand': child_info.get('auto_expand', child_type == 'table')
+                    }
+                
+                attributes = {
+                    'label': label,
+                    'node_type': node_type,
+                    'expandable': bool(children_dict),
+                    **node_data
+                }
+                visible = node_type in _VISIBLE_TYPES
+                in_graph = self.keep_hidden_nodes or visible
+                if in_graph:
+                    self._store_node(node_id, attributes)
+                if visible:
+                    self._visible_nodes.add(node_id)
+                    self._tooltips[node_id] = NodeFormatter.get_tooltip(self._nodes[node_id], node_type)
+                if children_dict:
+                    self._set_children(node_id, children_dict)
+                
+                # Create edge to parent if exists
+                if parent_id and parent_type:
+                    edge_type = self._get_edge_type(parent_type, node_type, hierarchy_config)
+                    if in_graph:
+                        self._store_edge(parent_id, node_id, {'edge_type': edge_type})
+                        if visible and parent_id in self._visible_nodes:
+                            self._visible_edges[parent_id, node_id] = None
+                    else:
+                        self._hidden_edges.setdefault(parent_id, {})[node_id] = {'edge_type': edge_type}
+                
+                if children:
+                    subtrees.append((node_id, node_type, children, child_labels))
             
-            # Recursively create children
-            if children:
-                self.create_hierarchy_nodes(children, hierarchy_config, node_id, node_type)
+            # Push in reverse so the first sibling's subtree is visited first
+            stack.extend(reversed(subtrees))
     
     
     def _get_edge_type(self, parent_type, child_type, hierarchy_config):
         """Get edge type from hierarchy configuration"""
-        for relationship in hierarchy_config.get('relationships', []):
-            if relationship['parent'] == parent_type and relationship['child'] == child_type:
-                return relationship['edge_type']
-        return 'default'
+        # Index relationships by (parent, child) once per hierarchy config
+        if self._edge_type_config is not hierarchy_config:
+            self._edge_type_map = {}
+            for relationship in hierarchy_config.get('relationships', []):
+                key = (relationship['parent'], relationship['child'])
+                self._edge_type_map.setdefault(key, relationship['edge_type'])
+            self._edge_type_config = hierarchy_config
+        
+        return self._edge_type_map.get((parent_type, child_type), 'default')
     
     def build_initial_graph(self, hierarchy_config=None):
-        visible_nodes = {node_id for node_id in self.G.nodes() 
-                        if self.G.nodes[node_id].get('node_type') in ['model', 'function']}
-        
-        for node_id in visible_nodes:
-            node_data = self.G.nodes[node_id]
+        # Build pyvis records directly and hand them over in bulk - net.add_node/add_edge
+        # validate every call and scan node_ids (a list) for duplicates. Defaults mirror pyvis:
+        # the network font colour wins over per-node fonts and directed edges get arrows.
+        font_override = {'font': {'color': self.net.font_color}} if self.net.font_color else {}
+        existing_ids = set(self.net.node_ids)
+        net_nodes = []
+        for node_id in self._visible_nodes:
+            if node_id in existing_ids:
+                continue
+            node_data = self._nodes[node_id]
             style = self._get_node_style(node_id, hierarchy_config)
-            self.net.add_node(node_id, label=node_data.get('label', node_id), **style)
+            net_nodes.append({
+                'shape': 'dot',
+                'color': '#97c2fc',
+                **style,
+                'id': node_id,
+                'label': node_data.get('label') or node_id,
+                **font_override
+            })
+        
+        arrows = {'arrows': 'to'} if self.net.directed else {}
+        existing_edges = {(edge['from'], edge['to']) for edge in self.net.edges}
+        net_edges = []
+        for source, target in self._visible_edges:
+            if (source, target) in existing_edges:
+                continue
+            edge_data = self._edges[source][target]
+            edge_type = edge_data.get('edge_type', 'default')
+            edge_props = self._get_edge_props(edge_type, edge_data)
+            net_edges.append({**arrows, **edge_props, 'from': source, 'to': target})
         
-        for source, target in self.G.edges():
-            if source in visible_nodes and target in visible_nodes:
-                edge_data = self.G.edges[source, target]
-                edge_type = edge_data.get('edge_type', 'default')
-                edge_props = self._get_edge_props(edge_type, edge_data)
-                self.net.add_edge(source, target, **edge_props)
+        self.net.nodes.extend(net_nodes)
+        self.net.node_ids.extend(node['id'] for node in net_nodes)
+        self.net.node_map.update((node['id'], node) for node in net_nodes)
+        self.net.edges.extend(net_edges)
     
 
+    def _build_auto_expand_plan(self, hidden_nodes):
+        """Map each parent to the descendants that auto-expand with it, in expansion order"""
+        def auto_children(node_id):
+            return [child_id for child_id, child_info in reversed(hidden_nodes[node_id].items())
+                    if child_info.get('auto_expand') and child_id in hidden_nodes]
+        
+        plan = {}
+        for parent_id in hidden_nodes:
+            order = []
+            seen = {parent_id}
+            stack = auto_children(parent_id)
+            while stack:
+                node_id = stack.pop()
+                if node_id in seen:
+                    continue
+                seen.add(node_id)
+                order.append(node_id)
+                stack.extend(auto_children(node_id))
+            if order:
+                plan[parent_id] = order
+        return plan
+    
     def generate_javascript_handlers(self):
         """Generate streamlined JavaScript injection using external handlers"""
-        hidden_nodes_json = {}
-        for parent, children in self.hidden_nodes.items():
-            hidden_nodes_json[parent] = {}
-            for child_id, child_info in children.items():
-                if isinstance(child_info, dict):
-                    hidden_nodes_json[parent][child_id] = child_info
-                else:
-                    hidden_nodes_json[parent][child_id] = {'label': str(child_info), 'node_type': 'table'}
+        # Nothing to expand or label (e.g. a root-only graph) - reuse the prebuilt script
+        if not self._hidden_nodes and not self._hidden_edges and not self._edges:
+            return _EMPTY_HANDLERS_JS
+        # Re-saving an unchanged graph (e.g. after tweaking options) reuses the encoded payload
+        if self._handlers_js is not None:
+            return self._handlers_js
         
-        # Create edge data structure for JavaScript
-        edge_data = {}
-        for source, target, data in self.G.edges(data=True):
-            if source not in edge_data:
-                edge_data[source] = {}
-            edge_data[source][target] = data
+        # Child info is normalized when stored, so the table serializes as-is
+        hidden_nodes_json = self._hidden_nodes
+        auto_expand_plan = self._build_auto_expand_plan(hidden_nodes_json)
         
-        return f"""
-        <script src="static/graph-handlers.js"></script>
-        <script type="text/javascript">
-            // Initialize graph handlers with data
-            initializeGraphHandlers(
-                {json.dumps(hidden_nodes_json)},
-                {json.dumps(GRAPH_STYLES)},
-                {json.dumps(edge_data)}
-            );
-        </script>
-        """
+        # Create edge data structure for JavaScript - the handlers only read edge_type
+        # and method, so other edge attributes stay out of the page
+        edge_data = {source: {target: _slim_edge_data(data) for target, data in targets.items()}
+                     for source, targets in self._edges.items()}
+        for source, targets in self._hidden_edges.items():
+            slim_targets = edge_data.setdefault(source, {})
+            for target, data in targets.items():
+                slim_targets[target] = _slim_edge_data(data)
+        
+        self._handlers_js = _handlers_script(_to_json(hidden_nodes_json), _to_json(edge_data),
+                                             _to_json(auto_expand_plan))
+        return self._handlers_js
     
     def save_graph(self, filename="expandable_network.html", hierarchy_config=None):
         self.build_initial_graph(hierarchy_config)
-        self.net.set_options('''
-        var options = {
-          "layout": {
-            "hierarchical": {
-              "enabled": true,
-              "direction": "UD",
-              "sortMethod": "directed",
-              "shakeTowards": "roots",
-              "nodeSpacing": 200,
-              "levelSeparation": 250
-            }
-          },
-          "physics": {
-            "enabled": false
-          },
-          "interaction": {
-            "dragNodes": true,
-            "dragView": true,
-            "zoomView": true
-          },
-          "nodes": {
-            "font": {
-              "multi": true,
-              "align": "center"
-            }
-          },
-          "edges": {
-            "font": {
-              "size": 10,
-              "color": "#333333",
-              "strokeWidth": 1,
-              "strokeColor": "#ffffff"
-            },
-            "labelHighlightBold": false
-          }
-        }
-        ''')
-        self.net.save_graph(filename)
-        
-        with open(filename, 'r') as file:
-            html_content = file.read()
+        # Options are constant, so skip set_options re-parsing the same JSON text per save
+        self.net.options = _PYVIS_OPTIONS
+        # Render the page in memory and write it once, rather than letting pyvis write the
+        # file only to read it back for the handler injection
+        html_content = self.net.generate_html(name=filename)
+        if self.net.cdn_resources == 'local':
+            _copy_local_resources()
         
         js_injection = self.generate_javascript_handlers()
         
-        if 'var network = new vis.Network' in html_content:
-            pos = html_content.find('</script>', html_content.find('var network = new vis.Network')) + 9
-            html_content = html_content[:pos] + js_injection + html_content[pos:]
+        # Inject after the script that creates the network (else before </body>), writing
+        # the page around the injection rather than building a concatenated copy
+        anchor = html_content.find('var network = new vis.Network')
+        if anchor != -1:
+            pos = html_content.find('</script>', anchor) + len('</script>')
         else:
-            html_content = html_content.replace('</body>', f'{js_injection}</body>')
+            pos = html_content.find('</body>')
+            if pos == -1:
+                pos = len(html_content)
         
-        with open(filename, 'w') as file:
-            file.write(html_content)
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(html_content[:pos])
+            file.write(js_injection)
+            file.write(html_content[pos:])
         
         return filename
 
-def build_expandable_hierarchy_graph(root_name, df_sources, hierarchy_config=None, output_file="lineage_graph.html"):
+def build_expandable_hierarchy_graph(root_name, df_sources, hierarchy_config=None, output_file="lineage_graph.html",
+                                     keep_hidden_nodes=True):
     """
     Extensible hierarchy graph builder - works with any hierarchy configuration.
     
     Args:
         root_name: Name of the root node (e.g., model name)
-        df_sources: DataFrame with lineage data
+        df_sources: DataFrame with lineage data (not modified)
         hierarchy_config: Hierarchy configuration dict (uses DEFAULT_HIERARCHY_CONFIG if None)
         output_file: Output HTML file name
+        keep_hidden_nodes: Also store collapsed nodes in graph.G (set False to keep
+            them only in the browser payload and save memory on large lineages)
     
     Returns:
         ExpandableNetworkGraph instance
@@ -456,7 +785,7 @@ def build_expandable_hierarchy_graph(root_name, df_sources, hierarchy_config=Non
     if hierarchy_config is None:
         hierarchy_config = DEFAULT_HIERARCHY_CONFIG
     
-    graph = ExpandableNetworkGraph(height="1200px", width="100%")
+    graph = ExpandableNetworkGraph(height="1200px", width="100%", keep_hidden_nodes=keep_hidden_nodes)
     
     # Create root node
     graph.add_node(root_name, {'name': root_name}, 'model')
@@ -464,16 +793,21 @@ def build_expandable_hierarchy_graph(root_name, df_sources, hierarchy_config=Non
     if df_sources.empty:
         return graph
     
-    # Prepare data for hierarchy building
-    df_prepared = df_sources.copy()
-    
-    # Add model_name and ensure datapoint_id exists
-    df_prepared['model_name'] = root_name
-    if 'datapoint_id' not in df_prepared.columns:
-        df_prepared['datapoint_id'] = df_prepared.apply(
-            lambda row: f"{row['datapoint']}__{row['function_name']}" if pd.notna(row.get('function_name')) else row['datapoint'], 
-            axis=1
-        )
+    # Prepare data for hierarchy building: add model_name and ensure datapoint_id exists.
+    # assign leaves df_sources untouched; with Copy-on-Write (the default from pandas 3.0)
+    # it shares the existing columns instead of copying them, on older pandas it copies
+    new_columns = {'model_name': root_name}
+    if 'datapoint_id' not in df_sources.columns:
+        # Vectorized "<datapoint>__<function_name>", falling back to the datapoint alone
+        datapoints = df_sources['datapoint']
+        if 'function_name' in df_sources.columns:
+            function_names = df_sources['function_name']
+            new_columns['datapoint_id'] = datapoints.where(
+                function_names.isna(), datapoints.astype(str) + '__' + function_names.astype(str)
+            )
+        else:
+            new_columns['datapoint_id'] = datapoints
+    df_prepared = df_sources.assign(**new_columns)
     
     # Build hierarchical structure
     structure = graph.build_hierarchy_structure(df_prepared, hierarchy_config)
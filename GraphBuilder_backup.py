@@ -1,337 +1,605 @@
 import networkx as nx
+from collections import defaultdict
+import copy
+from functools import lru_cache
+import pyvis
 from pyvis.network import Network
 import json
+import os
+import re
+import shutil
 import pandas as pd
+from GraphBuilder import _json_default
 
-class ExpandableNetworkGraph:
-    def __init__(self, width="100%", height="600px"):
-        self.G = nx.DiGraph()
-        self.hidden_nodes = {}
-        self.net = Network(width=width, height=height, bgcolor="#ffffff", font_color="black", directed=True)
-        self.styles = {
-            'model': {'color': {'background': '#1F4E79', 'border': '#0F3E69'}, 'size': 40, 'shape': 'ellipse', 'font': {'size': 20, 'color': 'white', 'bold': True}},
-            'function': {'color': {'background': '#4A90A4', 'border': '#3A8094'}, 'size': 30, 'shape': 'box', 'font': {'size': 16, 'color': 'white', 'bold': True}},
-            'dataset': {'color': {'background': '#87CEEB', 'border': '#77BEDB'}, 'size': 40, 'shape': 'diamond', 'font': {'size': 14, 'color': '#000080', 'bold': True}},
-            'datapoint': {'color': {'background': '#B0E0E6', 'border': '#A0D0D6'}, 'size': 25, 'shape': 'ellipse', 'font': {'size': 11, 'color': '#000080'}, 'widthConstraint': {'maximum': 150}},
-            'table': {'color': {'background': '#E6F3FF', 'border': '#D6E3EF'}, 'size': 30, 'shape': 'database', 'font': {'size': 12, 'color': '#000080', 'bold': True}, 'widthConstraint': {'maximum': 180}},
-        }
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 
-    def add_node(self, node_id, label, node_type='regular', children=None, **properties):
-        self.G.add_node(node_id, label=label, node_type=node_type, expandable=bool(children), **properties)
-        if children:
-            self.hidden_nodes[node_id] = children if isinstance(children, dict) else {f"{node_id}_child_{i}": child for i, child in enumerate(children)}
-    
-    def add_edge(self, source, target, **properties):
-        self.G.add_edge(source, target, **properties)
-    
-    def _get_node_style(self, node_id):
-        node_data = self.G.nodes[node_id]
-        node_type = node_data.get('node_type', 'regular')
-        style = self.styles.get(node_type, {'color': {'background': '#F0F8FF', 'border': '#D0E8EF'}, 'size': 15, 'shape': 'ellipse'}).copy()
-        
-        # Add hover title with node properties only
-        title_parts = []
-        
-        # For function nodes, show only function_definition
-        if node_type == 'function' and 'function_definition' in node_data and node_data['function_definition']:
-            title_parts.append(node_data['function_definition'])
-        # For table nodes, show full breakdown (Database, Schema, Table)
-        elif node_type == 'table':
-            # Use node_id as it contains the full table name
-            table_name = node_id
-            # Parse the table name into components
-            parts = table_name.split('.')
-            if len(parts) >= 3:
-                database = parts[0]
-                schema = parts[1]
-                table = '.'.join(parts[2:])  # In case table name has dots
-                title_parts.append(f"Database: {database}")
-                title_parts.append(f"Schema: {schema}")
-                title_parts.append(f"Table: {table}")
-            else:
-                title_parts.append(f"Table: {table_name}")
-        # For other nodes, show relevant properties
-        else:
-            for key, value in node_data.items():
-                if key not in ['label', 'node_type', 'expandable', 'function_name'] and value is not None:
-                    title_parts.append(f"{key.title().replace('_', ' ')}: {value}")
-        
-        if title_parts:
-            style['title'] = "\\n".join(title_parts)
-        
-        # Use visual indicator for expandable nodes (border style)
-        if node_data.get('expandable', False):
-            style['borderWidth'] = 3
-            style['borderWidthSelected'] = 4
-        
-        return style
-    
-    def build_initial_graph(self):
-        visible_nodes = {node_id for node_id in self.G.nodes() 
-                        if self.G.nodes[node_id].get('node_type') in ['model', 'function']}
-        
-        for node_id in visible_nodes:
-            node_data = self.G.nodes[node_id]
-            style = self._get_node_style(node_id)
-            self.net.add_node(node_id, label=node_data.get('label', node_id), **style)
-        
-        for source, target in self.G.edges():
-            if source in visible_nodes and target in visible_nodes:
-                edge_data = self.G.edges[source, target]
-                edge_props = {'width': 2, 'color': '#666666'}
-                
-                # Add method property to edge label if it exists
-                if 'method' in edge_data:
-                    edge_props['label'] = edge_data['method']
-                    edge_props['font'] = {'size': 10, 'color': '#333333'}
-                
-                self.net.add_edge(source, target, **edge_props)
-    
-    def generate_javascript_handlers(self):
-        hidden_nodes_json = {}
-        for parent, children in self.hidden_nodes.items():
-            hidden_nodes_json[parent] = {}
-            for child_id, child_info in children.items():
-                if isinstance(child_info, dict):
-                    hidden_nodes_json[parent][child_id] = child_info
-                else:
-                    hidden_nodes_json[parent][child_id] = {'label': str(child_info), 'node_type': 'table'}
-        
-        # Create edge data structure for JavaScript
-        edge_data = {}
-        for source, target, data in self.G.edges(data=True):
-            if source not in edge_data:
-                edge_data[source] = {}
-            edge_data[source][target] = data
-        
-        return f"""
+def _to_json(data):
+    """Serialize data for the JavaScript payload, preferring orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=_json_default, separators=(',', ':'))
+
+def _clean_table_labels(table_names):
+    """Build readable labels for a Series of table names with vectorized string ops"""
+    # Fully qualified names (DATABASE.SCHEMA.TABLE) are labelled by their last part only,
+    # so only the final dot needs splitting
+    stems = table_names.where(table_names.str.count(r'\.') < 2, table_names.str.rsplit('.', n=1).str[-1])
+    return stems.str.replace('_VW', '', regex=False).str.replace('_', ' ', regex=False).str.title()
+
+def _copy_local_resources():
+    """Copy the JS/CSS assets referenced by pyvis's 'local' pages into the working directory"""
+    templates_dir = os.path.join(os.path.dirname(pyvis.__file__), 'templates')
+    for resource in ('bindings', 'tom-select', 'vis-9.1.2'):
+        target = os.path.join('lib', resource)
+        if not os.path.exists(target):
+            shutil.copytree(os.path.join(templates_dir, 'lib', resource), target)
+
+# Fallback style for node types without an entry in ExpandableNetworkGraph.styles
+_DEFAULT_NODE_STYLE = {'color': {'background': '#F0F8FF', 'border': '#D0E8EF'}, 'size': 15, 'shape': 'ellipse'}
+_DEFAULT_EDGE_PROPS = {'width': 2, 'color': '#666666'}
+
+# Node attributes that never appear in the generic property tooltip
+_TOOLTIP_SKIP_FIELDS = frozenset({'label', 'node_type', 'expandable', 'function_name'})
+
+@lru_cache(maxsize=4096)
+def _table_title_parts(table_name):
+    """Tooltip lines breaking a table name into Database/Schema/Table, memoized for recent names"""
+    # In case table name has dots, everything after the schema is the table
+    parts = table_name.split('.', 2)
+    if len(parts) == 3:
+        return (f"Database: {parts[0]}", f"Schema: {parts[1]}", f"Table: {parts[2]}")
+    return (f"Table: {table_name}",)
+
+def _property_title_parts(node_data):
+    """Tooltip lines listing a node's non-empty properties"""
+    return [f"{key.title().replace('_', ' ')}: {value}" for key, value in node_data.items()
+            if key not in _TOOLTIP_SKIP_FIELDS and value is not None]
+
+# Default node styles per type (each graph styles from its own copy); the browser part of
+# the defaults is serialized for the JavaScript side once
+_NODE_STYLES = {
+    'model': {'color': {'background': '#1F4E79', 'border': '#0F3E69'}, 'size': 40, 'shape': 'ellipse', 'font': {'size': 20, 'color': 'white', 'bold': True}},
+    'function': {'color': {'background': '#4A90A4', 'border': '#3A8094'}, 'size': 30, 'shape': 'box', 'font': {'size': 16, 'color': 'white', 'bold': True}},
+    'dataset': {'color': {'background': '#87CEEB', 'border': '#77BEDB'}, 'size': 40, 'shape': 'diamond', 'font': {'size': 14, 'color': '#000080', 'bold': True}},
+    'datapoint': {'color': {'background': '#B0E0E6', 'border': '#A0D0D6'}, 'size': 25, 'shape': 'ellipse', 'font': {'size': 11, 'color': '#000080'}, 'widthConstraint': {'maximum': 150}},
+    'table': {'color': {'background': '#E6F3FF', 'border': '#D6E3EF'}, 'size': 30, 'shape': 'database', 'font': {'size': 12, 'color': '#000080', 'bold': True}, 'widthConstraint': {'maximum': 180}},
+}
+# Types drawn on the initial graph; the browser only ever adds nodes of other types
+_INITIAL_NODE_TYPES = frozenset({'model', 'function'})
+
+def _child_styles(styles):
+    """Styles for the node types the browser can add while expanding"""
+    return {node_type: style for node_type, style in styles.items() if node_type not in _INITIAL_NODE_TYPES}
+
+_CHILD_NODE_STYLES_JSON = _to_json(_child_styles(_NODE_STYLES))
+
+# Spacing of the precomputed top-down layout of the initial graph
+_NODE_SPACING = 200
+_LEVEL_SEPARATION = 250
+
+# Graphs drawing more nodes than this up front (hidden children not counted) get the
+# force-directed layout unless one is requested
+_FORCE_LAYOUT_MIN_NODES = 500
+
+# vis.js page options per layout, handed to pyvis as dicts so nothing is re-parsed per save
+# Edges are hidden while dragging and drawn straight (no per-frame bezier work), and
+# node shapes skip image interpolation
+_INTERACTION_OPTIONS = {'dragNodes': True, 'dragView': True, 'zoomView': True,
+                        'hideEdgesOnDrag': True, 'hideNodesOnDrag': False, 'navigationButtons': False}
+_NODE_OPTIONS = {'font': {'multi': True, 'align': 'center'}, 'shapeProperties': {'interpolation': False}}
+_EDGE_OPTIONS = {
+    'font': {'size': 10, 'color': '#333333', 'strokeWidth': 1, 'strokeColor': '#ffffff'},
+    'labelHighlightBold': False,
+    'smooth': False
+}
+_PAGE_OPTIONS = {
+    # Positions computed by build_initial_graph, drawn as given
+    'precomputed': {
+        'layout': {'hierarchical': {'enabled': False}, 'improvedLayout': False},
+        'physics': {'enabled': False},
+        'interaction': _INTERACTION_OPTIONS,
+        'nodes': _NODE_OPTIONS,
+        'edges': _EDGE_OPTIONS
+    },
+    # vis.js's own top-down solver; does not scale much past a few hundred nodes
+    'hierarchical': {
+        'layout': {'hierarchical': {'enabled': True, 'direction': 'UD', 'sortMethod': 'directed',
+                                    'shakeTowards': 'roots', 'nodeSpacing': _NODE_SPACING,
+                                    'levelSeparation': _LEVEL_SEPARATION}},
+        'physics': {'enabled': False},
+        'interaction': _INTERACTION_OPTIONS,
+        'nodes': _NODE_OPTIONS,
+        'edges': _EDGE_OPTIONS
+    },
+    # Force-directed without stabilization: draws at once and settles live, for large graphs
+    'forceAtlas2': {
+        'layout': {'improvedLayout': False},
+        'physics': {
+            'enabled': True,
+            'solver': 'forceAtlas2Based',
+            'forceAtlas2Based': {'gravitationalConstant': -50, 'springLength': 100, 'springConstant': 0.08},
+            'stabilization': {'enabled': False}
+        },
+        'interaction': {**_INTERACTION_OPTIONS, 'hideEdgesOnDrag': True, 'hideNodesOnDrag': True},
+        'nodes': _NODE_OPTIONS,
+        'edges': _EDGE_OPTIONS
+    },
+}
+
+# Inline click/expand handlers injected into the saved page, split once around its data slots
+_HANDLERS_JS_TEMPLATE = """
         <script type="text/javascript">
-            const hiddenNodesData = {json.dumps(hidden_nodes_json)};
+            const hiddenNodesData = __HIDDEN_NODES__;
             const expandedNodes = new Set();
-            const nodeStyles = {json.dumps(self.styles)};
-            window.graphData = {{edges: {json.dumps(edge_data)}}};
+            const nodeStyles = __NODE_STYLES__;
+            window.graphData = {edges: __EDGE_DATA__};
             
-            network.on("click", function(params) {{
-                if (params.nodes.length > 0) {{
+            network.on("click", function(params) {
+                if (params.nodes.length > 0) {
                     const nodeId = params.nodes[0];
-                    if (hiddenNodesData[nodeId]) {{
+                    if (hiddenNodesData[nodeId]) {
                         expandedNodes.has(nodeId) ? collapseNode(nodeId) : expandNode(nodeId);
-                    }}
-                }}
-            }});
+                    }
+                }
+            });
             
-            function expandNode(parentId) {{
+            function expandNode(parentId, knownParentPos) {
                 if (expandedNodes.has(parentId)) return;
                 
                 const children = hiddenNodesData[parentId];
                 const newNodes = [], newEdges = [];
                 const existingNodes = new Set(nodes.getIds());
                 
-                // Get parent position for linear arrangement
-                const parentPos = network.getPositions([parentId])[parentId];
+                // Get parent position for linear arrangement (auto-expanded children pass theirs in)
+                const parentPos = knownParentPos || network.getPositions([parentId])[parentId];
                 let childIndex = 0;
                 const childrenCount = Object.keys(children).length;
                 
-                for (const [childId, childData] of Object.entries(children)) {{
-                    if (!existingNodes.has(childId)) {{
-                        const style = nodeStyles[childData.node_type] || {{}};
+                for (const [childId, childData] of Object.entries(children)) {
+                    if (!existingNodes.has(childId)) {
+                        const style = nodeStyles[childData.node_type] || {};
                         // Position children with better spacing based on node type
                         let xSpacing = 250; // Default spacing
                         let yOffset = 180;  // Default vertical offset
                         
-                        if (childData.node_type === 'dataset') {{
+                        if (childData.node_type === 'dataset') {
                             xSpacing = 400;
                             yOffset = 220;
-                        }} else if (childData.node_type === 'datapoint') {{
+                        } else if (childData.node_type === 'datapoint') {
                             xSpacing = 180;
                             yOffset = 180;
-                        }} else if (childData.node_type === 'table') {{
+                        } else if (childData.node_type === 'table') {
                             xSpacing = 200;
                             yOffset = 180;
-                        }}
+                        }
                         
                         // Special layout for datapoints to avoid overcrowding
                         let xPos, yPos;
-                        if (childData.node_type === 'datapoint' && childrenCount > 6) {{
+                        if (childData.node_type === 'datapoint' && childrenCount > 6) {
                             // Arrange in multiple rows for many datapoints
                             const itemsPerRow = Math.ceil(Math.sqrt(childrenCount));
                             const row = Math.floor(childIndex / itemsPerRow);
                             const col = childIndex % itemsPerRow;
                             xPos = parentPos.x + (col * xSpacing) - (itemsPerRow * xSpacing / 2);
                             yPos = parentPos.y + yOffset + (row * 80);
-                        }} else {{
+                        } else {
                             // Standard linear arrangement
                             xPos = parentPos.x + (childIndex * xSpacing) - (childrenCount * xSpacing / 2);
                             yPos = parentPos.y + yOffset;
-                        }}
+                        }
                         
-                        newNodes.push({{
+                        newNodes.push({
                             id: childId, 
                             label: childData.label, 
                             x: xPos,
                             y: yPos,
                             ...style
-                        }});
+                        });
                         childIndex++;
-                    }}
-                    const edgeProps = {{from: parentId, to: childId, width: 2, color: '#666666'}};
+                    }
+                    const edgeProps = {from: parentId, to: childId, width: 2, color: '#666666'};
                     // Add edge properties if they exist in the graph data
-                    if (window.graphData && window.graphData.edges && window.graphData.edges[parentId] && window.graphData.edges[parentId][childId]) {{
+                    if (window.graphData && window.graphData.edges && window.graphData.edges[parentId] && window.graphData.edges[parentId][childId]) {
                         const edgeData = window.graphData.edges[parentId][childId];
-                        if (edgeData.method) {{
+                        if (edgeData.method) {
                             edgeProps.label = edgeData.method;
-                            edgeProps.font = {{size: 10, color: '#333333'}};
-                        }}
-                    }}
+                            edgeProps.font = {size: 10, color: '#333333'};
+                        }
+                    }
                     newEdges.push(edgeProps);
-                }}
+                }
                 
-                nodes.add(newNodes);
-                edges.add(newEdges);
                 expandedNodes.add(parentId);
-                
-                // Auto-expand nodes that should expand immediately (like tables under datapoints)
-                setTimeout(() => {{
-                    for (const [childId, childData] of Object.entries(children)) {{
-                        if (childData.auto_expand && hiddenNodesData[childId] && !expandedNodes.has(childId)) {{
-                            expandNode(childId);
-                        }}
-                    }}
-                }}, 100); // Small delay to ensure nodes are rendered first
-            }}
+                addInBatches(parentId, nextGeneration(parentId), newNodes, newEdges, () => {
+                    // Auto-expand nodes that should expand immediately (like tables under datapoints)
+                    setTimeout(() => {
+                        const autoExpandIds = Object.entries(children)
+                            .filter(([childId, childData]) => childData.auto_expand && hiddenNodesData[childId])
+                            .map(([childId]) => childId);
+                        if (autoExpandIds.length === 0) return;
+                        // Read all their positions at once, before any of them adds nodes
+                        const positions = network.getPositions(autoExpandIds);
+                        for (const childId of autoExpandIds) {
+                            if (!expandedNodes.has(childId)) {
+                                expandNode(childId, positions[childId]);
+                            }
+                        }
+                    }, 100); // Small delay to ensure nodes are rendered first
+                });
+            }
             
-            function collapseNode(parentId) {{
+            // Large expansions go in (and out) in slices across animation frames so the page
+            // keeps painting; the first slice is applied at once, so small ones are unchanged.
+            // Every expand/collapse of a parent starts a new generation, and slices from an
+            // older one stop, so quick toggles never leave two runs adding the same nodes.
+            const BATCH_SIZE = 50;
+            const toggleGenerations = {};
+            
+            function nextGeneration(parentId) {
+                toggleGenerations[parentId] = (toggleGenerations[parentId] || 0) + 1;
+                return toggleGenerations[parentId];
+            }
+            
+            function addInBatches(parentId, generation, newNodes, newEdges, onDone) {
+                let start = 0;
+                function step() {
+                    if (toggleGenerations[parentId] !== generation) return;
+                    nodes.add(newNodes.slice(start, start + BATCH_SIZE));
+                    edges.add(newEdges.slice(start, start + BATCH_SIZE));
+                    start += BATCH_SIZE;
+                    if (start < newNodes.length || start < newEdges.length) {
+                        requestAnimationFrame(step);
+                    } else {
+                        onDone();
+                    }
+                }
+                step();
+            }
+            
+            function removeInBatches(parentId, generation, nodeIds) {
+                let start = 0;
+                function step() {
+                    if (toggleGenerations[parentId] !== generation) return;
+                    nodes.remove(nodeIds.slice(start, start + BATCH_SIZE));
+                    start += BATCH_SIZE;
+                    if (start < nodeIds.length) {
+                        requestAnimationFrame(step);
+                    } else {
+                        network.stabilize();
+                    }
+                }
+                step();
+            }
+            
+            function collapseNode(parentId) {
                 if (!expandedNodes.has(parentId)) return;
                 
                 const children = hiddenNodesData[parentId];
                 const childIds = Object.keys(children);
                 
                 childIds.forEach(childId => expandedNodes.has(childId) && collapseNode(childId));
-                nodes.remove(childIds);
                 expandedNodes.delete(parentId);
-                network.stabilize();
-            }}
+                removeInBatches(parentId, nextGeneration(parentId), childIds);
+            }
         </script>
         """
-    
-    def save_graph(self, filename="expandable_network.html"):
-        self.build_initial_graph()
-        self.net.set_options('''
-        var options = {
-          "layout": {
-            "hierarchical": {
-              "enabled": true,
-              "direction": "UD",
-              "sortMethod": "directed",
-              "shakeTowards": "roots",
-              "nodeSpacing": 200,
-              "levelSeparation": 250
-            }
-          },
-          "physics": {
-            "enabled": false
-          },
-          "interaction": {
-            "dragNodes": true,
-            "dragView": true,
-            "zoomView": true
-          },
-          "nodes": {
-            "font": {
-              "multi": true,
-              "align": "center"
+_HANDLERS_JS_HEAD, _HANDLERS_JS_AFTER_HIDDEN, _HANDLERS_JS_AFTER_STYLES, _HANDLERS_JS_TAIL = re.split(
+    r'__HIDDEN_NODES__|__NODE_STYLES__|__EDGE_DATA__', _HANDLERS_JS_TEMPLATE
+)
+
+class ExpandableNetworkGraph:
+    def __init__(self, width="100%", height="600px"):
+        # Node and edge tables: node_id -> attributes and source -> {target: attributes}.
+        # No graph algorithms run on them, so plain dicts stand in for a networkx graph (see G)
+        self._nodes = {}
+        self._edges = {}
+        # Ids added through add_node; edges create bare entries in the node table, so it
+        # cannot tell whether a node has been added with its attributes
+        self._node_ids = set()
+        # networkx view of the tables (see G), cleared whenever nodes or edges are added
+        self._graph = None
+        self.hidden_nodes = {}
+        self.net = Network(width=width, height=height, bgcolor="#ffffff", font_color="black", directed=True)
+        # Own copy, so restyling one graph never touches another or the defaults
+        self.styles = copy.deepcopy(_NODE_STYLES)
+
+    def add_node(self, node_id, label, node_type='regular', children=None, **properties):
+        self._graph = None
+        node_data = {'label': label, 'node_type': node_type, 'expandable': bool(children), **properties}
+        # Merge into an existing entry like networkx would
+        existing = self._nodes.get(node_id)
+        if existing is None:
+            self._nodes[node_id] = node_data
+        else:
+            existing.update(node_data)
+        self._node_ids.add(node_id)
+        if children:
+            if not isinstance(children, dict):
+                children = {f"{node_id}_child_{i}": child for i, child in enumerate(children)}
+            # Normalize child info once so the table serializes as-is
+            self.hidden_nodes[node_id] = {
+                child_id: child_info if isinstance(child_info, dict) else {'label': str(child_info), 'node_type': 'table'}
+                for child_id, child_info in children.items()
             }
-          },
-          "edges": {
-            "font": {
-              "size": 10,
-              "color": "#333333",
-              "strokeWidth": 1,
-              "strokeColor": "#ffffff"
-            },
-            "labelHighlightBold": false
-          }
-        }
-        ''')
-        self.net.save_graph(filename)
+    
+    def add_edge(self, source, target, **properties):
+        # Endpoints are added as needed and attributes merge into an existing edge, like networkx
+        self._graph = None
+        self._nodes.setdefault(source, {})
+        self._nodes.setdefault(target, {})
+        targets = self._edges.setdefault(source, {})
+        existing = targets.get(target)
+        if existing is None:
+            targets[target] = properties
+        else:
+            existing.update(properties)
+    
+    @property
+    def G(self):
+        """Read-only networkx snapshot of the node/edge tables, rebuilt only after the graph changes"""
+        # Frozen, so structural changes raise instead of being silently lost. Attribute dicts
+        # are copies, so edits to them are not rendered; use add_node/add_edge instead
+        if self._graph is None:
+            graph = nx.DiGraph()
+            graph.add_nodes_from(self._nodes.items())
+            graph.add_edges_from((source, target, data) for source, targets in self._edges.items()
+                                 for target, data in targets.items())
+            self._graph = nx.freeze(graph)
+        return self._graph
+    
+    def _get_node_style(self, node_id):
+        node_data = self._nodes[node_id]
+        node_type = node_data.get('node_type', 'regular')
+        # Base styles are shared; per-node settings go into a separate overrides dict
+        style = self.styles.get(node_type, _DEFAULT_NODE_STYLE)
+        overrides = {}
         
-        with open(filename, 'r') as file:
-            html_content = file.read()
+        # Add hover title with node properties only
+        # For function nodes, show only function_definition
+        if node_type == 'function' and node_data.get('function_definition'):
+            title_parts = [node_data['function_definition']]
+        # For table nodes, show full breakdown (Database, Schema, Table)
+        elif node_type == 'table':
+            # Use node_id as it contains the full table name
+            title_parts = _table_title_parts(node_id)
+        # For other nodes, show relevant properties
+        else:
+            title_parts = _property_title_parts(node_data)
+        
+        if title_parts:
+            overrides['title'] = "\\n".join(title_parts)
+        
+        # Use visual indicator for expandable nodes (border style)
+        if node_data.get('expandable', False):
+            overrides['borderWidth'] = 3
+            overrides['borderWidthSelected'] = 4
+        
+        return {**style, **overrides} if overrides else style
+    
+    def build_initial_graph(self):
+        visible_nodes = {node_id for node_id, node_data in self._nodes.items()
+                         if node_data.get('node_type') in _INITIAL_NODE_TYPES}
+        
+        # Build pyvis records directly and hand them over in bulk - net.add_node/add_edge
+        # validate every call and scan node_ids (a list) for duplicates. Defaults mirror pyvis:
+        # the network font colour wins over per-node fonts and directed edges get arrows.
+        font_override = {'font': {'color': self.net.font_color}} if self.net.font_color else {}
+        existing_ids = set(self.net.node_ids)
+        positions = self._initial_positions(visible_nodes)
+        net_nodes = []
+        for node_id in visible_nodes:
+            if node_id in existing_ids:
+                continue
+            node_data = self._nodes[node_id]
+            style = self._get_node_style(node_id)
+            x, y = positions[node_id]
+            net_nodes.append({
+                'shape': 'dot',
+                'color': '#97c2fc',
+                **style,
+                'id': node_id,
+                'label': node_data.get('label') or node_id,
+                'x': x,
+                'y': y,
+                **font_override
+            })
+        
+        arrows = {'arrows': 'to'} if self.net.directed else {}
+        existing_edges = {(edge['from'], edge['to']) for edge in self.net.edges}
+        net_edges = []
+        for source, targets in self._edges.items():
+            if source not in visible_nodes:
+                continue
+            for target, edge_data in targets.items():
+                if target not in visible_nodes or (source, target) in existing_edges:
+                    continue
+                edge_props = _DEFAULT_EDGE_PROPS
+                
+                # Add method property to edge label if it exists
+                if 'method' in edge_data:
+                    edge_props = {**edge_props, 'label': edge_data['method'], 'font': {'size': 10, 'color': '#333333'}}
+                
+                net_edges.append({**arrows, **edge_props, 'from': source, 'to': target})
+        
+        self.net.nodes.extend(net_nodes)
+        self.net.node_ids.extend(node['id'] for node in net_nodes)
+        self.net.node_map.update((node['id'], node) for node in net_nodes)
+        self.net.edges.extend(net_edges)
+    
+    def _initial_positions(self, visible_nodes):
+        """Top-down layered positions for the initial graph, so vis.js can skip its hierarchical solver"""
+        # Roots first, then breadth-first levels; nodes are taken in insertion order
+        # so the layout does not depend on set ordering
+        has_parent = {target for source in visible_nodes for target in self._edges.get(source, ())}
+        layer = [node_id for node_id in self._nodes if node_id in visible_nodes and node_id not in has_parent]
+        placed = set(layer)
+        layers = []
+        while layer:
+            layers.append(layer)
+            next_layer = []
+            for node_id in layer:
+                for child in self._edges.get(node_id, ()):
+                    if child in visible_nodes and child not in placed:
+                        placed.add(child)
+                        next_layer.append(child)
+            layer = next_layer
+        # Nodes only reachable through a cycle get a row of their own at the bottom
+        leftover = [node_id for node_id in self._nodes if node_id in visible_nodes and node_id not in placed]
+        if leftover:
+            layers.append(leftover)
+        
+        positions = {}
+        for depth, layer in enumerate(layers):
+            offset = (len(layer) - 1) / 2
+            for index, node_id in enumerate(layer):
+                positions[node_id] = ((index - offset) * _NODE_SPACING, depth * _LEVEL_SEPARATION)
+        return positions
+    
+    def generate_javascript_handlers(self):
+        # Create edge data structure for JavaScript - the handlers only read the method
+        # (to label edges), so only edges carrying one are shipped, with nothing else
+        edge_data = {}
+        for source, targets in self._edges.items():
+            methods = {target: {'method': data['method']} for target, data in targets.items() if 'method' in data}
+            if methods:
+                edge_data[source] = methods
+        
+        # Compared by value (a few small dicts), so edited styles are never served stale
+        styles_json = (_CHILD_NODE_STYLES_JSON if self.styles == _NODE_STYLES
+                       else _to_json(_child_styles(self.styles)))
+        return ''.join((
+            _HANDLERS_JS_HEAD, _to_json(self.hidden_nodes),
+            _HANDLERS_JS_AFTER_HIDDEN, styles_json,
+            _HANDLERS_JS_AFTER_STYLES, _to_json(edge_data),
+            _HANDLERS_JS_TAIL
+        ))
+    
+    def save_graph(self, filename="expandable_network.html", layout=None):
+        """Write the page; layout is 'precomputed', 'hierarchical' or 'forceAtlas2' (None picks by initial graph size)"""
+        self.build_initial_graph()
+        if layout is None:
+            # Only the nodes build_initial_graph drew are laid out when the page opens
+            layout = 'forceAtlas2' if len(self.net.nodes) > _FORCE_LAYOUT_MIN_NODES else 'precomputed'
+        if layout not in _PAGE_OPTIONS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {', '.join(_PAGE_OPTIONS)}")
+        self.net.options = _PAGE_OPTIONS[layout]
+        # Render the page in memory and write it once, rather than letting pyvis write the
+        # file only to read it back for the handler injection
+        html_content = self.net.generate_html(name=filename)
+        if self.net.cdn_resources == 'local':
+            _copy_local_resources()
         
         js_injection = self.generate_javascript_handlers()
         
-        if 'var network = new vis.Network' in html_content:
-            pos = html_content.find('</script>', html_content.find('var network = new vis.Network')) + 9
-            html_content = html_content[:pos] + js_injection + html_content[pos:]
+        # Inject after the script that creates the network (else before </body>), writing
+        # the page around the injection rather than building a concatenated copy
+        anchor = html_content.find('var network = new vis.Network')
+        if anchor != -1:
+            pos = html_content.find('</script>', anchor) + len('</script>')
         else:
-            html_content = html_content.replace('</body>', f'{js_injection}</body>')
+            pos = html_content.find('</body>')
+            if pos == -1:
+                pos = len(html_content)
         
-        with open(filename, 'w') as file:
-            file.write(html_content)
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(html_content[:pos])
+            file.write(js_injection)
+            file.write(html_content[pos:])
         
         return filename
 
-def build_model_graph_expandable_final(model_name, df_sources, output_file="model_lineage_expandable.html"):
+def build_model_graph_expandable_final(model_name, df_sources, output_file="model_lineage_expandable.html", layout=None):
     graph = ExpandableNetworkGraph(height="1200px", width="100%")
     graph.add_node(model_name, model_name, 'model')
     
     if df_sources.empty:
         return graph
     
-    has_source_info = 'source_instance' in df_sources.columns and not df_sources['source_instance'].isna().all()
-    df_sources['datapoint_id'] = df_sources.apply(
-        lambda row: f"{row['datapoint']}_{row['source_instance']}" if has_source_info and pd.notna(row['source_instance']) else row['datapoint'], 
-        axis=1
-    )
+    has_source_info = 'source_instance' in df_sources.columns and bool(df_sources['source_instance'].notna().any())
+    # Vectorized "<datapoint>_<source_instance>", falling back to the datapoint alone
+    datapoints = df_sources['datapoint']
+    if has_source_info:
+        source_instances = df_sources['source_instance']
+        df_sources['datapoint_id'] = datapoints.where(
+            source_instances.isna(), datapoints.astype(str) + '_' + source_instances.astype(str)
+        )
+    else:
+        df_sources['datapoint_id'] = datapoints
+    
+    # Low-cardinality name columns group and deduplicate on integer codes as categoricals
+    df_sources = df_sources.astype({column: 'category' for column in ('dataset_name', 'function_name', 'table_name', 'method')
+                                    if column in df_sources.columns})
+    
+    # Clean each distinct table name once instead of per datapoint/table pair - as a
+    # categorical, the column's categories already are its distinct non-null names
+    table_names = pd.Series(df_sources['table_name'].cat.categories, dtype=object)
+    table_labels = dict(zip(table_names, _clean_table_labels(table_names)))
     
     # Create dataset groups using dataset_name column
-    dataset_groups = {}
+    dataset_groups = defaultdict(list)
     datapoint_to_tables = {}
     
-    for dp_id, group in df_sources.groupby("datapoint_id"):
-        tables = group['table_name'].dropna().unique().tolist()
-        # Get method information for this datapoint
-        method_info = group['method'].dropna().iloc[0] if 'method' in group.columns and not group['method'].dropna().empty else None
-        # Get additional properties
-        dataset_name = group['dataset_name'].dropna().iloc[0] if 'dataset_name' in group.columns and not group['dataset_name'].dropna().empty else None
-        function_def = group['function_def'].dropna().iloc[0] if 'function_def' in group.columns and not group['function_def'].dropna().empty else None
+    # First non-null properties of every datapoint in a single grouped aggregation
+    property_fields = [field for field in ('method', 'dataset_name', 'function_def') if field in df_sources.columns]
+    dp_properties = df_sources.groupby("datapoint_id").agg({'datapoint': 'first', **{field: 'first' for field in property_fields}})
+    dp_properties = dp_properties.astype(object).where(dp_properties.notna(), None)
+    # Distinct tables per datapoint, in order of first appearance
+    table_rows = df_sources[['datapoint_id', 'table_name']].dropna(subset=['table_name']).drop_duplicates()
+    dp_tables = defaultdict(list)
+    for dp_id, table in zip(table_rows['datapoint_id'], table_rows['table_name']):
+        dp_tables[dp_id].append(table)
+    
+    for dp_id, properties in zip(dp_properties.index, dp_properties.to_dict('records')):
+        dataset_name = properties.get('dataset_name')
         
         datapoint_to_tables[dp_id] = {
-            'tables': tables,
-            'display_name': group['datapoint'].iloc[0],
-            'method': method_info,
+            'tables': dp_tables.get(dp_id, []),
+            'display_name': properties['datapoint'],
+            'method': properties.get('method'),
             'dataset_name': dataset_name,
-            'function_def': function_def
+            'function_def': properties.get('function_def')
         }
         
         # Group datapoints by their dataset_name (use as-is from df_sample)
-        if dataset_name and pd.notna(dataset_name):
-            if dataset_name not in dataset_groups:
-                dataset_groups[dataset_name] = []
+        if dataset_name:
             dataset_groups[dataset_name].append(dp_id)
     
-    functions_data = {}
+    # Source instance suffix of each datapoint id, split once rather than per appearance
+    source_suffixes = {dp_id: dp_id.split('_', 1)[1] if has_source_info and '_' in dp_id else None
+                       for dp_id in datapoint_to_tables}
+    
+    functions_data = defaultdict(dict)
     functions_metadata = {}
-    for func_name, group in df_sources.groupby("function_name"):
-        if pd.notna(func_name):
-            dp_ids = group['datapoint_id'].unique()
-            functions_data[func_name] = {dp_id: group[group['datapoint_id'] == dp_id]['datapoint'].iloc[0] for dp_id in dp_ids}
-            # Store function metadata
-            func_def = group['function_def'].dropna().iloc[0] if 'function_def' in group.columns and not group['function_def'].dropna().empty else None
-            functions_metadata[func_name] = {'function_definition': func_def}
+    function_rows = df_sources.dropna(subset=['function_name'])
+    # First row of each (function, datapoint) pair, functions in sorted order like groupby
+    first_rows = (function_rows.drop_duplicates(['function_name', 'datapoint_id'])
+                  .sort_values('function_name', kind='stable'))
+    for func_name, dp_id, dp_name in zip(first_rows['function_name'], first_rows['datapoint_id'], first_rows['datapoint']):
+        functions_data[func_name][dp_id] = dp_name
+    # Store function metadata
+    if 'function_def' in function_rows.columns:
+        func_defs = function_rows.groupby("function_name", observed=True)['function_def'].first()
+        func_defs = func_defs.astype(object).where(func_defs.notna(), None).to_dict()
+    else:
+        func_defs = {}
+    for func_name in functions_data:
+        functions_metadata[func_name] = {'function_definition': func_defs.get(func_name)}
     
     
-    # Create function nodes with dataset groups
+    # Create function nodes with dataset groups, and the dataset group nodes with their datapoints
+    # and the edges down to them
     for func_name, datapoints in functions_data.items():
         # Group datapoints by their dataset_name
-        func_dataset_groups = {}
+        func_dataset_groups = defaultdict(list)
         for dp_id, dp_name in datapoints.items():
             dp_data = datapoint_to_tables.get(dp_id, {})
             dataset_name = dp_data.get('dataset_name')
             if dataset_name:
-                if dataset_name not in func_dataset_groups:
-                    func_dataset_groups[dataset_name] = []
-                source_info = f" ({dp_id.split('_', 1)[1]})" if '_' in dp_id and has_source_info else ""
+                source_suffix = source_suffixes.get(dp_id)
+                source_info = f" ({source_suffix})" if source_suffix is not None else ""
                 func_dataset_groups[dataset_name].append({'id': dp_id, 'label': dp_name + source_info})
         
         # Create children structure with dataset groups
@@ -351,18 +619,6 @@ def build_model_graph_expandable_final(model_name, df_sources, output_file="mode
             
         graph.add_node(func_name, func_name, 'function', group_children, **func_props)
         graph.add_edge(model_name, func_name)
-    
-    # Add dataset group nodes with their datapoints
-    for func_name, datapoints in functions_data.items():
-        func_dataset_groups = {}
-        for dp_id, dp_name in datapoints.items():
-            dp_data = datapoint_to_tables.get(dp_id, {})
-            dataset_name = dp_data.get('dataset_name')
-            if dataset_name:
-                if dataset_name not in func_dataset_groups:
-                    func_dataset_groups[dataset_name] = []
-                source_info = f" ({dp_id.split('_', 1)[1]})" if '_' in dp_id and has_source_info else ""
-                func_dataset_groups[dataset_name].append({'id': dp_id, 'label': dp_name + source_info})
         
         for dataset_name, datapoints_list in func_dataset_groups.items():
             group_id = f"{func_name}_{dataset_name}"
@@ -374,23 +630,19 @@ def build_model_graph_expandable_final(model_name, df_sources, output_file="mode
             # Use dataset name as-is from df_sample
             graph.add_node(group_id, dataset_name, 'dataset', datapoint_children)
             graph.add_edge(func_name, group_id)
+            for dp_id in datapoint_children:
+                graph.add_edge(group_id, dp_id)
     
     # Create datapoint nodes that connect directly to tables
     for dp_id, dp_data in datapoint_to_tables.items():
-        table_children = {}
-        for table in dp_data['tables']:
-            if pd.notna(table):
-                # Create cleaner table labels
-                table_parts = table.split('.')
-                if len(table_parts) >= 3:
-                    clean_label = table_parts[-1].replace('_VW', '').replace('_', ' ').title()
-                else:
-                    clean_label = table.replace('_VW', '').replace('_', ' ').title()
-                table_children[table] = {'label': clean_label, 'node_type': 'table', 'auto_expand': True}
+        # Table lists only hold non-null names, so no per-table null check is needed
+        table_children = {table: {'label': table_labels[table], 'node_type': 'table', 'auto_expand': True}
+                          for table in dp_data['tables']}
         
         display_label = dp_data['display_name'].replace('_', ' ').title()
-        if '_' in dp_id and has_source_info:
-            display_label = f"{display_label} ({dp_id.split('_', 1)[1]})"
+        source_suffix = source_suffixes[dp_id]
+        if source_suffix is not None:
+            display_label = f"{display_label} ({source_suffix})"
         
         # Add additional properties to datapoint nodes
         node_props = {}
@@ -401,36 +653,18 @@ def build_model_graph_expandable_final(model_name, df_sources, output_file="mode
             
         graph.add_node(dp_id, display_label, 'datapoint', table_children, **node_props)
     
-    # Connect dataset groups to their datapoints
-    for func_name, datapoints in functions_data.items():
-        for dp_id in datapoints:
-            # Find which dataset group this datapoint belongs to
-            dp_data = datapoint_to_tables.get(dp_id, {})
-            dataset_name = dp_data.get('dataset_name')
-            if dataset_name:
-                group_id = f"{func_name}_{dataset_name}"
-                graph.add_edge(group_id, dp_id)
-    
     # Connect datapoints directly to tables (no dataset layer)
     for dp_id, dp_data in datapoint_to_tables.items():
+        # Add method as edge property if available - one per datapoint, shared by its tables
+        edge_props = {'method': dp_data['method']} if dp_data.get('method') else {}
         for table in dp_data['tables']:
-            if pd.notna(table):
-                # Add method as edge property if available
-                edge_props = {}
-                if dp_data.get('method'):
-                    edge_props['method'] = dp_data['method']
-                graph.add_edge(dp_id, table, **edge_props)
-                
-                # Add table nodes (no children since tables are leaf nodes) - only if not already added
-                if table not in graph.G.nodes:
-                    table_parts = table.split('.')
-                    if len(table_parts) >= 3:
-                        clean_label = table_parts[-1].replace('_VW', '').replace('_', ' ').title()
-                    else:
-                        clean_label = table.replace('_VW', '').replace('_', ' ').title()
-                    graph.add_node(table, clean_label, 'table', table_name=table)
+            graph.add_edge(dp_id, table, **edge_props)
+            
+            # Add table nodes (no children since tables are leaf nodes) - only if not already added
+            if table not in graph._node_ids:
+                graph.add_node(table, table_labels[table], 'table', table_name=table)
     
-    graph.save_graph(output_file)
+    graph.save_graph(output_file, layout)
     
     return graph
 
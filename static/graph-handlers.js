@@ -1,15 +1,34 @@
 // Interactive graph handlers for expandable network visualization
+
+// Default edge styling, shared by every edge created on expand
+const DEFAULT_EDGE = {width: 2, color: '#666666'};
+
+// Child spacing per node type for pages saved before the table was passed in from Python
+const DEFAULT_LAYOUT_CONFIGS = {
+    'dataset': {xSpacing: 400, yOffset: 220},
+    'datapoint': {xSpacing: 180, yOffset: 180},
+    'table': {xSpacing: 200, yOffset: 180},
+    'column': {xSpacing: 150, yOffset: 160},
+    'downstream_table': {xSpacing: 220, yOffset: 200},
+    'downstream_column': {xSpacing: 140, yOffset: 160},
+    'default': {xSpacing: 250, yOffset: 180}
+};
+
 class GraphInteractionManager {
     constructor() {
         this.hiddenNodesData = {};
         this.expandedNodes = new Set();
         this.nodeStyles = {};
+        this.layoutConfigs = {};
+        this.autoExpandPlan = {};
         this.graphData = {edges: {}};
     }
 
-    initialize(hiddenNodes, nodeStyles, edgeData) {
+    initialize(hiddenNodes, nodeStyles, edgeData, layoutConfigs, autoExpandPlan) {
         this.hiddenNodesData = hiddenNodes;
         this.nodeStyles = nodeStyles;
+        this.layoutConfigs = layoutConfigs || DEFAULT_LAYOUT_CONFIGS;
+        this.autoExpandPlan = autoExpandPlan || {};
         this.graphData = {edges: edgeData};
         
         // Set up click handler
@@ -26,12 +45,28 @@ class GraphInteractionManager {
     expandNode(parentId) {
         if (this.expandedNodes.has(parentId)) return;
         
-        const children = this.hiddenNodesData[parentId];
         const newNodes = [], newEdges = [];
         const existingNodes = new Set(nodes.getIds());
+        const newPositions = {};
+        
+        this.collectChildren(parentId, existingNodes, newPositions, newNodes, newEdges);
         
-        // Get parent position for layout
-        const parentPos = network.getPositions([parentId])[parentId];
+        // Auto-expand descendants from the precomputed plan in the same batch
+        for (const nodeId of this.autoExpandPlan[parentId] || []) {
+            if (!this.expandedNodes.has(nodeId)) {
+                this.collectChildren(nodeId, existingNodes, newPositions, newNodes, newEdges);
+            }
+        }
+        
+        nodes.add(newNodes);
+        edges.add(newEdges);
+    }
+
+    collectChildren(parentId, existingNodes, newPositions, newNodes, newEdges) {
+        const children = this.hiddenNodesData[parentId];
+        
+        // Get parent position for layout - parents added in this batch are not drawn yet
+        const parentPos = newPositions[parentId] || network.getPositions([parentId])[parentId];
         let childIndex = 0;
         const childrenCount = Object.keys(children).length;
         
@@ -52,6 +87,8 @@ class GraphInteractionManager {
                     y: yPos,
                     ...style
                 });
+                existingNodes.add(childId);
+                newPositions[childId] = {x: xPos, y: yPos};
                 childIndex++;
             }
             
@@ -60,18 +97,7 @@ class GraphInteractionManager {
             newEdges.push(edgeProps);
         }
         
-        nodes.add(newNodes);
-        edges.add(newEdges);
         this.expandedNodes.add(parentId);
-        
-        // Auto-expand nodes that should expand immediately
-        setTimeout(() => {
-            for (const [childId, childData] of Object.entries(children)) {
-                if (childData.auto_expand && this.hiddenNodesData[childId] && !this.expandedNodes.has(childId)) {
-                    this.expandNode(childId);
-                }
-            }
-        }, 100);
     }
 
     collapseNode(parentId) {
@@ -114,20 +140,11 @@ class GraphInteractionManager {
     }
 
     getLayoutConfig(nodeType) {
-        const layoutConfigs = {
-            'dataset': {xSpacing: 400, yOffset: 220},
-            'datapoint': {xSpacing: 180, yOffset: 180},
-            'table': {xSpacing: 200, yOffset: 180},
-            'column': {xSpacing: 150, yOffset: 160},
-            'downstream_table': {xSpacing: 220, yOffset: 200},
-            'downstream_column': {xSpacing: 140, yOffset: 160},
-            'default': {xSpacing: 250, yOffset: 180}
-        };
-        return layoutConfigs[nodeType] || layoutConfigs['default'];
+        return this.layoutConfigs[nodeType] || this.layoutConfigs['default'];
     }
 
     getEdgeProperties(parentId, childId) {
-        const edgeProps = {from: parentId, to: childId, width: 2, color: '#666666'};
+        const edgeProps = {from: parentId, to: childId, ...DEFAULT_EDGE};
         
         // Add edge properties if they exist in the graph data
         if (this.graphData.edges[parentId] && this.graphData.edges[parentId][childId]) {
@@ -149,6 +166,6 @@ class GraphInteractionManager {
 const graphManager = new GraphInteractionManager();
 
 // Initialization function to be called from Python
-function initializeGraphHandlers(hiddenNodes, nodeStyles, edgeData) {
-    graphManager.initialize(hiddenNodes, nodeStyles, edgeData);
+function initializeGraphHandlers(hiddenNodes, nodeStyles, edgeData, layoutConfigs, autoExpandPlan) {
+    graphManager.initialize(hiddenNodes, nodeStyles, edgeData, layoutConfigs, autoExpandPlan);
 }
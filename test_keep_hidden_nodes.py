@@ -0,0 +1,24 @@
+from GraphBuilder import ExpandableNetworkGraph
+
+
+def drawn_edges(keep_hidden_nodes):
+    """Add an edge before its target node exists, then draw the initial graph"""
+    graph = ExpandableNetworkGraph(keep_hidden_nodes=keep_hidden_nodes)
+    graph.add_node('M', {'model_name': 'M'}, 'model')
+    graph.add_edge('M', 'F', 'model_to_function')
+    graph.add_node('F', {'function_name': 'F'}, 'function')
+    graph.build_initial_graph()
+    return [(edge['from'], edge['to']) for edge in graph.net.edges]
+
+
+def test_edge_before_node():
+    # Collapsed nodes kept out of the graph must not lose edges added ahead of their endpoints
+    assert drawn_edges(keep_hidden_nodes=True) == [('M', 'F')]
+    assert drawn_edges(keep_hidden_nodes=False) == [('M', 'F')]
+
+
+if __name__ == '__main__':
+    for keep in (True, False):
+        print(f"keep_hidden_nodes={keep}: edges={drawn_edges(keep)}")
+    test_edge_before_node()
+    print("OK")